@@ -1,13 +1,25 @@
 # scraper/scrape_te_total_vehicle_sales.py
+import asyncio
+import base64
 import os
 import json
-import time
 import gzip
-import warnings
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 
+import aiohttp
 from dateutil.relativedelta import relativedelta
+import orjson
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -15,18 +27,56 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.remote.client_config import ClientConfig
+from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
 
-warnings.filterwarnings(
-    "ignore",
-    message="Converting to PeriodArray/Index representation will drop timezone information.",
-    category=UserWarning,
-)
-
 BASE_URL = "https://tradingeconomics.com"
 METRIC_PATH = "total-vehicle-sales"
 
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+)
+
+# Fast path: TE embeds the Highcharts series data in the page HTML, so a plain
+# GET + JSON parse is enough for most countries. Selenium stays as a fallback.
+HTTP_CONCURRENCY = int(os.environ.get("SCRAPER_HTTP_CONCURRENCY", "8"))
+HTTP_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept-Language": "en-US,en;q=0.9",
+}
+SERIES_DATA_RE = re.compile(r'"data"\s*:\s*(\[\[.*?\]\])', re.S)
+CHART_XHR_RE = re.compile(r"tradingeconomics\.com/chart", re.I)
+
+# Force the browser path for every country (e.g. if TE stops embedding the
+# series, or for debugging the fallback itself).
+USE_SELENIUM = os.environ.get("USE_SELENIUM") == "1"
+
+# Anti-bot interstitials show their banner near the top of the page, so one
+# case-insensitive regex pass over a capped HTML slice is enough to spot them.
+BLOCK_RE = re.compile(r"captcha|verify you are human|attention required|cloudflare", re.I)
+BLOCK_SCAN_CHARS = 20_000
+
+# Master XLSX is opt-in: it re-serializes the full history every run.
+EMIT_MASTER_XLSX = os.environ.get("EMIT_MASTER_XLSX") == "1"
+
+# Opt-in session reuse: point REUSE_CDP_URL at a long-running chromedriver
+# (e.g. "http://127.0.0.1:9515") to skip Chrome startup between runs. Session
+# ids of still-alive browsers are persisted across invocations.
+REUSE_CDP_URL = os.environ.get("REUSE_CDP_URL")
+SESSION_ID_FILE = os.environ.get(
+    "REUSE_SESSION_FILE", os.path.join(tempfile.gettempdir(), "te_scraper_sessions")
+)
+_reusable_session_ids = []
+if REUSE_CDP_URL and os.path.exists(SESSION_ID_FILE):
+    with open(SESSION_ID_FILE, encoding="utf-8") as _f:
+        _reusable_session_ids = [line.strip() for line in _f if line.strip()]
+# Guards the RemoteWebDriver.execute shim: pool workers build drivers lazily
+# and must not interleave the newSession patch.
+_attach_lock = threading.Lock()
+
 TARGET_COUNTRIES = [
     "Australia",
     "Brazil",
@@ -61,12 +111,22 @@ os.makedirs(DEBUG_DIR, exist_ok=True)
 LATEST_DIR = os.path.join(DATA_DIR, "latest")
 os.makedirs(LATEST_DIR, exist_ok=True)
 
-# Master (append/upsert) outputs
+# Per-country cache: TE publishes monthly, so a country scraped since the
+# first of the current month doesn't need re-fetching. Not committed (see
+# .gitignore) — a fresh checkout starts cold. FORCE_REFRESH=1 bypasses it.
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+FORCE_REFRESH = os.environ.get("FORCE_REFRESH") == "1"
+
+# Master (append/upsert) outputs. Parquet is the canonical store; CSV.GZ and
+# XLSX are derived artifacts for downstream convenience.
+MASTER_PARQUET = os.path.join(LATEST_DIR, "master_total_vehicle_sales.parquet")
 MASTER_CSV_GZ = os.path.join(LATEST_DIR, "master_total_vehicle_sales.csv.gz")
 MASTER_XLSX = os.path.join(LATEST_DIR, "master_total_vehicle_sales.xlsx")
 MASTER_MANIFEST = os.path.join(LATEST_DIR, "manifest.json")
 
 # Optional: also publish "latest 10y" view for convenience
+LATEST10Y_PARQUET = os.path.join(LATEST_DIR, "total_vehicle_sales_monthly_last_10y.parquet")
 LATEST10Y_XLSX = os.path.join(LATEST_DIR, "total_vehicle_sales_monthly_last_10y.xlsx")
 LATEST10Y_CSV_GZ = os.path.join(LATEST_DIR, "total_vehicle_sales_monthly_last_10y.csv.gz")
 
@@ -78,18 +138,39 @@ cutoff_10y = (
 ).replace(tzinfo=None)
 
 
-def slugify_country(country: str) -> str:
-    if country in SLUG_OVERRIDES:
-        return SLUG_OVERRIDES[country]
-    return country.strip().lower().replace(" ", "-")
-
-
-def country_url(country: str) -> str:
-    return f"{BASE_URL}/{slugify_country(country)}/{METRIC_PATH}"
+# Frozen at import: callers look countries up instead of re-slugifying on
+# every call (and every retry).
+COUNTRY_SLUG = {
+    c: SLUG_OVERRIDES.get(c, c.strip().lower().replace(" ", "-"))
+    for c in TARGET_COUNTRIES
+}
+COUNTRY_URL = {c: f"{BASE_URL}/{COUNTRY_SLUG[c]}/{METRIC_PATH}" for c in TARGET_COUNTRIES}
+
+
+# Page weight we never need: the chart only requires the document + Highcharts
+# JS, so images/fonts/CSS and tracker calls are blocked at the CDP level.
+BLOCKED_URL_PATTERNS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.woff*",
+    "*.ttf",
+    "*.css",
+    "*google-analytics*",
+    "*googletagmanager*",
+    "*doubleclick*",
+    "*facebook*",
+    "*hotjar*",
+]
 
 
 def build_driver():
     opts = Options()
+    # "eager": driver.get returns at DOMContentLoaded; the explicit Highcharts
+    # wait covers actual readiness.
+    opts.page_load_strategy = "eager"
     opts.add_argument("--headless=new")
     opts.add_argument("--window-size=1920,1080")
     opts.add_argument("--disable-blink-features=AutomationControlled")
@@ -98,50 +179,209 @@ def build_driver():
     opts.add_argument("--disable-gpu")
     opts.add_argument("--lang=en-US")
     opts.add_argument("--disable-extensions")
-    opts.add_argument(
-        "--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+    opts.add_argument(f"--user-agent={USER_AGENT}")
+    opts.add_experimental_option(
+        "prefs", {"profile.managed_default_content_settings.images": 2}
     )
+    # Performance log feeds series_from_network with the chart XHR bodies
+    opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
 
-    # Chrome binary set by workflow
-    env_bin = os.environ.get("CHROME_BINARY")
-    if env_bin and os.path.exists(env_bin):
-        opts.binary_location = env_bin
+    if REUSE_CDP_URL:
+        driver = _attach_remote_driver(opts)
     else:
-        for p in ("/usr/bin/google-chrome", "/usr/bin/chromium", "/usr/bin/chromium-browser"):
-            if os.path.exists(p):
-                opts.binary_location = p
-                break
+        # Chrome binary set by workflow
+        env_bin = os.environ.get("CHROME_BINARY")
+        if env_bin and os.path.exists(env_bin):
+            opts.binary_location = env_bin
         else:
-            raise RuntimeError("No Chrome/Chromium binary found on runner.")
+            for p in ("/usr/bin/google-chrome", "/usr/bin/chromium", "/usr/bin/chromium-browser"):
+                if os.path.exists(p):
+                    opts.binary_location = p
+                    break
+            else:
+                raise RuntimeError("No Chrome/Chromium binary found on runner.")
 
-    # Chromedriver set by workflow
-    env_driver = os.environ.get("CHROMEDRIVER")
-    if env_driver and os.path.exists(env_driver):
-        service = Service(env_driver)
-    else:
-        service = Service()
+        # Chromedriver set by workflow
+        env_driver = os.environ.get("CHROMEDRIVER")
+        if env_driver and os.path.exists(env_driver):
+            service = Service(env_driver)
+        else:
+            service = Service()
+
+        service_path = getattr(service, "_path", None) or getattr(service, "path", None)
+        print(f"[driver] binary={opts.binary_location} driver={service_path}", flush=True)
+        driver = webdriver.Chrome(service=service, options=opts)
+
+    # Explicit waits gate every post-navigation assumption; make sure no
+    # implicit polling interval sneaks in under them.
+    driver.implicitly_wait(0)
+
+    # Remote sessions may lack the chromium vendor commands
+    if hasattr(driver, "execute_cdp_cmd"):
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+def _remote_client_config():
+    # All pooled workers share the one chromedriver endpoint; widen the
+    # urllib3 pool so their WebDriver commands don't serialize on a single
+    # kept-alive connection.
+    return ClientConfig(
+        remote_server_addr=REUSE_CDP_URL,
+        init_args_for_pool_manager={"maxsize": max(POOL_SIZE, 4)},
+    )
 
-    service_path = getattr(service, "_path", None) or getattr(service, "path", None)
-    print(f"[driver] binary={opts.binary_location} driver={service_path}", flush=True)
-    return webdriver.Chrome(service=service, options=opts)
 
+def _attach_remote_driver(opts):
+    """Reattach to a live session on the chromedriver at REUSE_CDP_URL, or
+    open a fresh remote session when none of the stored ids survived."""
+    with _attach_lock:
+        while _reusable_session_ids:
+            session_id = _reusable_session_ids.pop()
+            original_execute = RemoteWebDriver.execute
 
-def _dump_artifacts(driver, slug: str, label: str):
+            def reuse_execute(self, command, params=None, _sid=session_id):
+                if command == "newSession":
+                    return {"value": {"sessionId": _sid, "capabilities": {}}}
+                return original_execute(self, command, params)
+
+            RemoteWebDriver.execute = reuse_execute
+            try:
+                driver = webdriver.Remote(
+                    command_executor=REUSE_CDP_URL,
+                    options=opts,
+                    client_config=_remote_client_config(),
+                )
+            finally:
+                RemoteWebDriver.execute = original_execute
+
+            try:
+                driver.current_url  # probe: is the stored session still alive?
+                print(f"[driver] reattached session={session_id}", flush=True)
+                return driver
+            except WebDriverException:
+                print(f"[driver] stale session={session_id}, discarding", flush=True)
+
+        return webdriver.Remote(
+            command_executor=REUSE_CDP_URL,
+            options=opts,
+            client_config=_remote_client_config(),
+        )
+
+
+def _release_drivers(drivers):
+    """Quit drivers, or — when reusing sessions — keep them alive for the next
+    run: clear cookies and persist the session ids."""
+    if not REUSE_CDP_URL:
+        for d in drivers:
+            try:
+                d.quit()
+            except Exception:
+                pass
+        return
+
+    alive = []
+    for d in drivers:
+        try:
+            d.delete_all_cookies()
+            alive.append(d.session_id)
+        except Exception:
+            pass
+    # Keep the ids this run never popped — those sessions are still live on
+    # the shared chromedriver and would otherwise be orphaned.
+    alive.extend(_reusable_session_ids)
+    with open(SESSION_ID_FILE, "w", encoding="utf-8") as f:
+        f.write("\n".join(alive))
+
+
+class DriverHolder:
+    """Lazily (re)builds a driver so one crashed Chrome doesn't poison its
+    pool slot for the rest of the run."""
+
+    def __init__(self):
+        self.driver = None
+
+    def get(self):
+        if self.driver is None or self.driver.session_id is None:
+            self.driver = build_driver()
+        return self.driver
+
+    def recycle(self):
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        self.driver = None
+
+
+def _reset_driver_state(holder):
+    """Clear cookies/cache between countries so state leakage doesn't provoke
+    anti-bot re-renders; recycle the driver if even that fails."""
+    driver = holder.driver
+    if driver is None:
+        return
     try:
-        html_path = os.path.join(DEBUG_DIR, f"{slug}__{label}.html")
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(driver.page_source or "")
-        print(f"[debug] wrote {html_path}", flush=True)
-    except Exception as e:
-        print(f"[debug] failed to write html: {e}", flush=True)
+        driver.delete_all_cookies()
+        if hasattr(driver, "execute_cdp_cmd"):
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    except WebDriverException:
+        holder.recycle()
 
+
+def _write_artifacts(slug: str, label: str, meta, png):
+    if meta is not None:
+        try:
+            html_path = os.path.join(DEBUG_DIR, f"{slug}__{label}.html.gz")
+            with gzip.open(html_path, "wt", encoding="utf-8", compresslevel=1) as f:
+                f.write(f"<!-- title: {meta['title']} url: {meta['url']} -->\n")
+                f.write(meta["html"] or "")
+            print(f"[debug] wrote {html_path}", flush=True)
+        except Exception as e:
+            print(f"[debug] failed to write html: {e}", flush=True)
+
+    if png is not None:
+        try:
+            png_path = os.path.join(DEBUG_DIR, f"{slug}__{label}.png")
+            with open(png_path, "wb") as f:
+                f.write(png)
+            print(f"[debug] wrote {png_path}", flush=True)
+        except Exception as e:
+            print(f"[debug] failed to write screenshot: {e}", flush=True)
+
+
+def _dump_artifacts(driver, slug: str, label: str, final: bool = True):
+    # Opt-in: pulling page HTML/screenshots over the bridge costs MBs per miss.
+    if not os.environ.get("DEBUG_SCRAPER"):
+        return
+    # Only the last attempt is worth the I/O — earlier retries would dump the
+    # same page again anyway.
+    if not final:
+        return
+
+    meta = png = None
+    try:
+        # One bridge round-trip for everything textual
+        meta = driver.execute_script(
+            "return {title: document.title, url: location.href,"
+            " html: document.documentElement.outerHTML};"
+        )
+    except Exception as e:
+        print(f"[debug] failed to read page: {e}", flush=True)
     try:
-        png_path = os.path.join(DEBUG_DIR, f"{slug}__{label}.png")
-        driver.save_screenshot(png_path)
-        print(f"[debug] wrote {png_path}", flush=True)
+        png = driver.get_screenshot_as_png()
     except Exception as e:
-        print(f"[debug] failed to write screenshot: {e}", flush=True)
+        print(f"[debug] failed to take screenshot: {e}", flush=True)
+
+    if meta is None and png is None:
+        return
+    # Bridge reads are done; the disk writes happen off-thread so they don't
+    # stretch the retry backoff.
+    threading.Thread(
+        target=_write_artifacts, args=(slug, label, meta, png), daemon=True
+    ).start()
 
 
 def wait_for_highcharts(driver, timeout=60):
@@ -152,6 +392,38 @@ def wait_for_highcharts(driver, timeout=60):
     )
 
 
+def wait_for_range_span(driver, min_years=9, timeout=10):
+    """Wait until the x-axis extremes actually cover the clicked 10Y/MAX span;
+    returns False on timeout (series may simply be shorter)."""
+    ms = int(min_years * 365) * 86_400_000
+    js = (
+        "return Highcharts.charts.some(ch => {"
+        " if (!ch || !ch.xAxis || !ch.xAxis[0]) return false;"
+        " const e = ch.xAxis[0].getExtremes();"
+        f" return (e.max - e.min) > {ms};"
+        "});"
+    )
+    try:
+        WebDriverWait(driver, timeout).until(lambda d: d.execute_script(js))
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_series_points(driver, min_points=100, timeout=10):
+    """Wait for a range-button click to re-render the chart with the wider
+    series; returns False on timeout (short series are legitimate)."""
+    js = (
+        "return Highcharts.charts.some(ch => ch && ch.series && "
+        f"ch.series.some(s => s && s.points && s.points.length >= {int(min_points)}));"
+    )
+    try:
+        WebDriverWait(driver, timeout).until(lambda d: d.execute_script(js))
+        return True
+    except TimeoutException:
+        return False
+
+
 def click_te_10y_button(driver):
     sel = "a.hawk-chartOptions-datePicker-cnt-btn[data-span_str='10Y']"
     try:
@@ -186,104 +458,349 @@ def set_range_to_max_or_10y(driver):
     return driver.execute_script(js)
 
 
-def extract_highcharts_series(driver):
-    js = r"""
-    const results = [];
-    if (typeof Highcharts === 'undefined' || !Highcharts.charts) return results;
+# Installed once per page; later calls only ship "return window.__extractTE()"
+# across the WebDriver bridge. The (x, y) pairs come back as one base64 string
+# over a Float64Array buffer, so nothing is marshaled per element.
+EXTRACT_INSTALL_JS = r"""
+window.__extractTE = function () {
+  function encode(rows) {
+    const flat = new Float64Array(rows.length * 2);
+    for (let i = 0; i < rows.length; i++) {
+      flat[2 * i] = rows[i][0];
+      flat[2 * i + 1] = rows[i][1];
+    }
+    const bytes = new Uint8Array(flat.buffer);
+    let bin = '';
+    for (let i = 0; i < bytes.length; i += 0x8000) {
+      bin += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+    }
+    return btoa(bin);
+  }
+
+  if (typeof Highcharts === 'undefined' || !Highcharts.charts) return encode([]);
 
-    for (const ch of Highcharts.charts) {
-      if (!ch || !ch.series) continue;
+  let best = [];
+  outer:
+  for (const ch of Highcharts.charts) {
+    if (!ch || !ch.series) continue;
 
-      for (const s of ch.series) {
-        if (!s || !s.points || s.points.length === 0) continue;
-        if (s.options && (s.options.isInternal || s.options.id === 'navigator')) continue;
+    for (const s of ch.series) {
+      if (!s || !s.points || s.points.length === 0) continue;
+      if (s.options && (s.options.isInternal || s.options.id === 'navigator')) continue;
 
-        for (const p of s.points) {
-          if (p && typeof p.x === 'number' && typeof p.y === 'number') {
-            results.push([p.x, p.y]);
-          }
+      const rows = [];
+      for (const p of s.points) {
+        if (p && typeof p.x === 'number' && typeof p.y === 'number') {
+          rows.push([p.x, p.y]);
         }
-        if (results.length > 10) return results;
       }
+      // a real monthly series carries at least a year of points; hunt past
+      // stub series, but remember the longest in case nothing qualifies
+      if (rows.length >= 12) { best = rows; break outer; }
+      if (rows.length > best.length) best = rows;
     }
-    return results;
-    """
-    pts = driver.execute_script(js)
-    if not pts:
+  }
+  return encode(best);
+};
+"""
+
+
+def install_extractor(driver):
+    driver.execute_script(EXTRACT_INSTALL_JS)
+
+
+def extract_highcharts_series(driver):
+    if hasattr(driver, "execute_cdp_cmd"):
+        # Runtime.evaluate skips the WebDriver execute/sync wrapper; the
+        # payload is still the single base64 string.
+        res = driver.execute_cdp_cmd(
+            "Runtime.evaluate",
+            {"expression": "window.__extractTE()", "returnByValue": True},
+        )
+        raw = res.get("result", {}).get("value")
+    else:
+        raw = driver.execute_script("return window.__extractTE()")
+    if not raw:
+        return None
+
+    buf = np.frombuffer(base64.b64decode(raw), dtype="<f8").reshape(-1, 2)
+    if buf.size == 0:
+        return None
+    return _series_from_ms(buf)
+
+
+def _series_from_ms(arr):
+    """(N, 2) float array of [epoch_ms, value] -> date-sorted (ts_ns, value)
+    arrays, with non-finite pairs dropped. No pandas in the hot loop."""
+    ts_ms, val = arr[:, 0], arr[:, 1]
+    mask = np.isfinite(ts_ms) & np.isfinite(val)
+    ts_i8 = (ts_ms[mask] * 1_000_000).astype("int64")
+    val = val[mask]
+    if ts_i8.size == 0:
+        return None
+
+    # One np.unique pass over the raw int64 timestamps sorts AND dedups
+    # (first occurrence wins), instead of a stable argsort plus a later
+    # duplicate scan.
+    ts_u, idx = np.unique(ts_i8, return_index=True)
+    return ts_u.view("datetime64[ns]"), val[idx]
+
+
+def _normalize_monthly(ts_ns, values):
+    # Normalize to month start (plain NumPy truncation, no Period round-trip)
+    # and dedup in the same np.unique pass; the input is date-sorted, so
+    # "first index per month" keeps the same row a keep='first' dedup would.
+    months = ts_ns.astype("datetime64[M]").astype("datetime64[ns]")
+    months, idx = np.unique(months, return_index=True)
+    return months, values[idx]
+
+
+def _cache_path(country):
+    return os.path.join(CACHE_DIR, f"{COUNTRY_SLUG[country]}.parquet")
+
+
+def load_cached_series(country):
+    """(months, values) for a country already scraped this calendar month."""
+    if FORCE_REFRESH:
+        return None
+    path = _cache_path(country)
+    month_start = now_utc.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    try:
+        if os.path.getmtime(path) < month_start.timestamp():
+            return None
+    except OSError:
+        return None
+
+    df = pd.read_parquet(path)
+    return df["date"].values.astype("datetime64[ns]"), df["value"].values
+
+
+def save_cached_series(country, months, values):
+    try:
+        pd.DataFrame({"date": months, "value": values}).to_parquet(
+            _cache_path(country), engine="pyarrow", compression="zstd"
+        )
+    except OSError as e:
+        print(f"  [cache-fail] {country}: {e}", flush=True)
+
+
+def _series_from_pairs(data):
+    """Validated [[ts, y], ...] pairs -> (ts_ns, value) arrays, or None when
+    fewer than a dozen numeric pairs survive (not a real monthly series)."""
+    pts = [
+        p for p in data
+        if isinstance(p, list) and len(p) == 2
+        and isinstance(p[0], (int, float)) and isinstance(p[1], (int, float))
+    ]
+    if len(pts) > 10:
+        return _series_from_ms(np.asarray(pts, dtype=np.float64))
+    return None
+
+
+def _series_from_json_text(text):
+    """Series from a chart XHR body: either a bare [[ts, y], ...] array or a
+    Highcharts config embedding one."""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return parse_embedded_series(text)
+
+    if isinstance(data, list):
+        return _series_from_pairs(data)
+    return parse_embedded_series(text)
+
+
+def _drain_network_log(driver):
+    """Discard buffered performance-log entries so series_from_network only
+    ever sees XHRs from the upcoming navigation — on a reused driver the log
+    still holds the previous country's chart responses."""
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+
+
+def series_from_network(driver):
+    """Read the chart-data XHR straight out of the CDP network log instead of
+    waiting for the chart to render (and re-render after a range click)."""
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return None
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
         return None
 
-    df = pd.DataFrame(pts, columns=["ts", "value"])
-    df["date"] = pd.to_datetime(df["ts"], unit="ms", utc=True)
-    df = df.drop(columns=["ts"]).dropna().drop_duplicates().sort_values("date")
-    return df
+    for entry in entries:
+        try:
+            msg = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if msg.get("method") != "Network.responseReceived":
+            continue
+        params = msg.get("params", {})
+        if not CHART_XHR_RE.search(params.get("response", {}).get("url", "")):
+            continue
+
+        try:
+            body = driver.execute_cdp_cmd(
+                "Network.getResponseBody", {"requestId": params["requestId"]}
+            ).get("body", "")
+        except WebDriverException:
+            continue
+
+        series = _series_from_json_text(body)
+        # Only trust the XHR when it already carries the long series;
+        # otherwise fall through to the range-button path.
+        if series is not None and len(series[0]) >= 100:
+            return series
+    return None
 
 
-def scrape_country(driver, country, url, retry=2):
-    slug = slugify_country(country)
+def parse_embedded_series(html: str):
+    """Pull the first Highcharts series out of the page HTML without a browser."""
+    for m in SERIES_DATA_RE.finditer(html):
+        try:
+            pts = json.loads(m.group(1))
+        except ValueError:
+            continue
+        series = _series_from_pairs(pts)
+        if series is not None:
+            return series
+    return None
+
+
+async def fetch_country(session, sem, country, url):
+    async with sem:
+        try:
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                html = await resp.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"  [http-fail] {country}: {e}", flush=True)
+            return country, None
+
+    series = parse_embedded_series(html)
+    if series is None:
+        return country, None
+    return country, _normalize_monthly(*series)
+
+
+async def fetch_all_http(items):
+    sem = asyncio.Semaphore(HTTP_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(headers=HTTP_HEADERS, timeout=timeout) as session:
+        results = await asyncio.gather(
+            *[fetch_country(session, sem, country, url) for country, url in items]
+        )
+    return dict(results)
+
+
+def scrape_country(holder, country, url, retry=2):
+    slug = COUNTRY_SLUG[country]
     last_err = None
+    series = None
 
     for attempt in range(retry + 1):
         try:
+            driver = holder.get()
+            _drain_network_log(driver)
             driver.get(url)
             WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-            time.sleep(2)
 
-            try:
-                wait_for_highcharts(driver, timeout=60)
-            except TimeoutException as e:
-                _dump_artifacts(driver, slug, f"no_highcharts_attempt{attempt}")
-                raise e
-
-            clicked = click_te_10y_button(driver)
-            if clicked:
-                time.sleep(2)
-            else:
-                chosen = set_range_to_max_or_10y(driver)
-                if chosen:
-                    time.sleep(2)
+            head = driver.execute_script(
+                f"return document.documentElement.outerHTML.slice(0, {BLOCK_SCAN_CHARS});"
+            )
+            if BLOCK_RE.search(head or ""):
+                _dump_artifacts(driver, slug, f"blocked_attempt{attempt}", final=attempt >= retry)
+                raise WebDriverException("anti-bot interstitial detected")
+
+            # Cheapest first: the chart XHR may already be in the network log
+            series = series_from_network(driver)
+
+            if series is None:
+                try:
+                    wait_for_highcharts(driver, timeout=60)
+                except TimeoutException as e:
+                    _dump_artifacts(driver, slug, f"no_highcharts_attempt{attempt}", final=attempt >= retry)
+                    raise e
+
+                install_extractor(driver)
+
+                clicked = click_te_10y_button(driver)
+                if not clicked:
+                    clicked = bool(set_range_to_max_or_10y(driver))
+                if clicked and not wait_for_range_span(driver):
+                    # Extremes never widened — settle for the re-rendered series
+                    wait_for_series_points(driver)
+
+                series = extract_highcharts_series(driver)
 
-            df = extract_highcharts_series(driver)
-            if df is None or df.empty:
+            if series is None:
                 _dump_artifacts(driver, slug, f"no_series_attempt{attempt}")
                 return None
+            break
 
-            # Normalize to month start; store as naive timestamp
-            df["date"] = df["date"].dt.to_period("M").dt.to_timestamp()
+        # Only browser/network trouble is worth retrying (JavascriptException
+        # is a WebDriverException subclass); programming bugs should fail fast
+        # instead of burning the backoff budget.
+        except (TimeoutException, WebDriverException) as e:
+            last_err = e
+            # A dead/blocked session won't recover by retrying into it
+            if not isinstance(e, TimeoutException):
+                holder.recycle()
+            time.sleep(min(8, 2 ** attempt))
+    else:
+        print(f"  [fail] {country}: {last_err}", flush=True)
+        return None
 
-            df["country"] = country
-            df = df.drop_duplicates(subset=["country", "date"])
-            return df[["country", "date", "value"]]
+    # Array work runs outside the retry guard
+    return _normalize_monthly(*series)
 
-        except (TimeoutException, WebDriverException, Exception) as e:
-            last_err = e
-            time.sleep(2 + attempt)
 
-    print(f"  [fail] {country}: {last_err}", flush=True)
+def _read_master() -> pd.DataFrame | None:
+    if os.path.exists(MASTER_PARQUET):
+        return pd.read_parquet(MASTER_PARQUET)
+    # One-time migration: fall back to the legacy CSV.GZ master.
+    if os.path.exists(MASTER_CSV_GZ):
+        return pd.read_csv(MASTER_CSV_GZ, compression="gzip", parse_dates=["date"])
     return None
 
 
-def merge_with_existing(master_csv_gz: str, new_panel: pd.DataFrame) -> pd.DataFrame:
+def merge_with_existing(new_panel: pd.DataFrame) -> pd.DataFrame:
     """
     Append + upsert into a master dataset.
     Key is (country, date). New values win.
+    Returned frame is sorted on date (then country) so date slicing is cheap.
     """
     new_panel = new_panel.copy()
     new_panel["date"] = pd.to_datetime(new_panel["date"])  # ensure datetime64[ns]
 
-    if os.path.exists(master_csv_gz):
-        old = pd.read_csv(master_csv_gz, compression="gzip", parse_dates=["date"])
+    old = _read_master()
+    if old is not None:
         old = old[["country", "date", "value"]]
-        combined = pd.concat([old, new_panel], ignore_index=True)
-        # new wins -> keep last after sort+concat ordering (so we drop dupes keeping last)
-        combined = combined.sort_values(["country", "date"]).drop_duplicates(
-            subset=["country", "date"], keep="last"
-        )
-        return combined.sort_values(["country", "date"]).reset_index(drop=True)
+        # "New wins" without deduping the union: drop old rows whose key
+        # reappears in the new panel, then append. O(|new|) hash lookups.
+        old_keys = pd.MultiIndex.from_frame(old[["country", "date"]])
+        new_keys = pd.MultiIndex.from_frame(new_panel[["country", "date"]])
+        combined = pd.concat([old[~old_keys.isin(new_keys)], new_panel], ignore_index=True)
+        return combined.sort_values(["date", "country"]).reset_index(drop=True)
 
-    return new_panel.sort_values(["country", "date"]).reset_index(drop=True)
+    return new_panel.sort_values(["date", "country"]).reset_index(drop=True)
 
 
 def write_manifest(master: pd.DataFrame, latest10y: pd.DataFrame):
+    files = {
+        "master_parquet": "data/latest/master_total_vehicle_sales.parquet",
+        "master_csv_gz": "data/latest/master_total_vehicle_sales.csv.gz",
+        "latest10y_parquet": "data/latest/total_vehicle_sales_monthly_last_10y.parquet",
+        "latest10y_xlsx": "data/latest/total_vehicle_sales_monthly_last_10y.xlsx",
+        "latest10y_csv_gz": "data/latest/total_vehicle_sales_monthly_last_10y.csv.gz",
+        "manifest": "data/latest/manifest.json",
+    }
+    # The site hides the master-XLSX download link when the key is absent.
+    if EMIT_MASTER_XLSX:
+        files["master_xlsx"] = "data/latest/master_total_vehicle_sales.xlsx"
+
     manifest = {
         "dataset": "Total Vehicle Sales (Monthly)",
         "source": f"{BASE_URL}/",
@@ -292,82 +809,197 @@ def write_manifest(master: pd.DataFrame, latest10y: pd.DataFrame):
         "row_count_master": int(master.shape[0]),
         "row_count_latest10y": int(latest10y.shape[0]),
         "country_count": int(master["country"].nunique()),
-        "files": {
-            "master_xlsx": "data/latest/master_total_vehicle_sales.xlsx",
-            "master_csv_gz": "data/latest/master_total_vehicle_sales.csv.gz",
-            "latest10y_xlsx": "data/latest/total_vehicle_sales_monthly_last_10y.xlsx",
-            "latest10y_csv_gz": "data/latest/total_vehicle_sales_monthly_last_10y.csv.gz",
-            "manifest": "data/latest/manifest.json",
-        },
+        "files": files,
         "countries": TARGET_COUNTRIES,
         "latest10y_cutoff_utc": cutoff_10y.isoformat(),
     }
-    with open(MASTER_MANIFEST, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    with open(MASTER_MANIFEST, "wb") as f:
+        f.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
 
 
-def write_outputs(new_panel: pd.DataFrame):
-    # Merge into master (append + upsert)
-    master = merge_with_existing(MASTER_CSV_GZ, new_panel)
+def _excel_writer(path: str) -> pd.ExcelWriter:
+    # Plain xlsxwriter (no constant_memory): to_excel emits cells
+    # column-major, and constant-memory mode discards writes to already
+    # flushed rows, blanking every column after the first.
+    return pd.ExcelWriter(path, engine="xlsxwriter")
 
-    # Latest 10y view from master (convenience)
-    latest10y = master[master["date"] >= cutoff_10y].copy()
 
-    # Write master CSV.GZ (best canonical store)
-    csv_bytes = master.to_csv(index=False).encode("utf-8")
-    with gzip.open(MASTER_CSV_GZ, "wb") as f:
-        f.write(csv_bytes)
+def _write_csv_gz(df: pd.DataFrame, path: str):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Month-start timestamps: cast to date32 so the CSV keeps YYYY-MM-DD dates.
+    i = table.schema.get_field_index("date")
+    table = table.set_column(i, "date", table.column("date").cast(pa.date32()))
+    # compresslevel=1: ~3x faster than the default for a negligible size cost
+    # on CSV; Arrow's CompressedOutputStream can't set a level, so stream the
+    # C++ writer's output through stdlib gzip instead.
+    with gzip.open(path, "wb", compresslevel=1) as sink:
+        # quoting_style="needed" = pandas QUOTE_MINIMAL: values are only
+        # quoted when they contain structural characters. Remaining deltas vs
+        # the old pandas artifacts: Arrow quotes the header row and writes
+        # integral floats without the trailing ".0".
+        pacsv.write_csv(table, sink, pacsv.WriteOptions(quoting_style="needed"))
 
-    # Write master XLSX (optional; can get big over time)
-    with pd.ExcelWriter(MASTER_XLSX, engine="openpyxl") as writer:
-        master.to_excel(writer, sheet_name="panel", index=False)
 
-    # Write latest10y outputs
-    csv10_bytes = latest10y.to_csv(index=False).encode("utf-8")
-    with gzip.open(LATEST10Y_CSV_GZ, "wb") as f:
-        f.write(csv10_bytes)
-
-    with pd.ExcelWriter(LATEST10Y_XLSX, engine="openpyxl") as writer:
-        latest10y.to_excel(writer, sheet_name="panel", index=False)
+def write_outputs(new_panel: pd.DataFrame):
+    # Merge into master (append + upsert)
+    master = merge_with_existing(new_panel)
+
+    # Latest 10y view from master (convenience). Master is date-sorted, so a
+    # binary search replaces the full boolean scan.
+    start = master["date"].searchsorted(cutoff_10y, side="left")
+    latest10y = master.iloc[start:]
+
+    def _write_master_parquet():
+        # Canonical store
+        master.to_parquet(MASTER_PARQUET, engine="pyarrow", compression="zstd")
+
+    def _write_master_xlsx():
+        # Opt-in; it grows without bound and Parquet/CSV.GZ cover consumers
+        with _excel_writer(MASTER_XLSX) as writer:
+            master.to_excel(writer, sheet_name="panel", index=False)
+
+    def _write_latest10y_xlsx():
+        with _excel_writer(LATEST10Y_XLSX) as writer:
+            latest10y.to_excel(writer, sheet_name="panel", index=False)
+
+    # The artifacts are independent, and gzip/Arrow/xlsxwriter all release the
+    # GIL or run in C, so the writes overlap usefully.
+    def _write_latest10y_parquet():
+        latest10y.to_parquet(
+            LATEST10Y_PARQUET, engine="pyarrow", compression="zstd", compression_level=3
+        )
 
+    jobs = [
+        _write_master_parquet,
+        _write_latest10y_parquet,
+        lambda: _write_csv_gz(master, MASTER_CSV_GZ),
+        lambda: _write_csv_gz(latest10y, LATEST10Y_CSV_GZ),
+        _write_latest10y_xlsx,
+    ]
+    if EMIT_MASTER_XLSX:
+        jobs.append(_write_master_xlsx)
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as ex:
+        for fut in [ex.submit(job) for job in jobs]:
+            fut.result()
+
+    # Manifest last: it describes files that now all exist
     write_manifest(master, latest10y)
 
-    print(f"[out] wrote:\n- {MASTER_CSV_GZ}\n- {MASTER_XLSX}\n- {LATEST10Y_CSV_GZ}\n- {LATEST10Y_XLSX}\n- {MASTER_MANIFEST}", flush=True)
+    wrote = [MASTER_PARQUET, MASTER_CSV_GZ]
+    if EMIT_MASTER_XLSX:
+        wrote.append(MASTER_XLSX)
+    wrote += [LATEST10Y_PARQUET, LATEST10Y_CSV_GZ, LATEST10Y_XLSX, MASTER_MANIFEST]
+    print("[out] wrote:\n" + "\n".join(f"- {p}" for p in wrote), flush=True)
 
 
-def main():
-    driver = build_driver()
-    try:
-        items = [(c, country_url(c)) for c in TARGET_COUNTRIES]
-        print(f"[info] will_process={len(items)} countries", flush=True)
+# Pool size bounds concurrent requests against TE; workers > countries buys nothing.
+POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", "4"))
 
-        all_rows = []
-        start = time.time()
 
-        for i, (country, url) in enumerate(items, 1):
-            print(f"[{i}/{len(items)}] {country} -> {url}", flush=True)
+def _scrape_with_pooled_driver(holder_pool, country, url):
+    # Small staggered jitter so pooled workers don't hit TE in lockstep.
+    time.sleep(random.uniform(0.0, 0.1) * POOL_SIZE)
+    holder = holder_pool.get()
+    try:
+        series = scrape_country(holder, country, url, retry=2)
+        _reset_driver_state(holder)
+        return series
+    finally:
+        holder_pool.put(holder)
 
-            df = scrape_country(driver, country, url, retry=2)
-            if df is not None and not df.empty:
-                all_rows.append(df)
-                print(f"  [ok] rows={len(df)}", flush=True)
-            else:
-                print("  [warn] no data extracted", flush=True)
 
-            if i % 5 == 0:
-                elapsed = int(time.time() - start)
-                print(f"[progress] {i}/{len(items)} processed in {elapsed}s", flush=True)
+def scrape_selenium_pool(items):
+    """Selenium fallback: scrape `items` with a pool of headless drivers."""
+    pool_size = min(POOL_SIZE, len(items))
+    holders = [DriverHolder() for _ in range(pool_size)]
+    holder_pool = queue.Queue()
+    for h in holders:
+        holder_pool.put(h)
 
-            time.sleep(1.0)
+    parts = []
+    start = time.time()
+    done = 0
 
-        if not all_rows:
-            raise RuntimeError("No data extracted for any target country.")
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as ex:
+            futures = {
+                ex.submit(_scrape_with_pooled_driver, holder_pool, country, url): country
+                for country, url in items
+            }
+            for fut in as_completed(futures):
+                country = futures[fut]
+                done += 1
+                series = fut.result()
+                if series is not None:
+                    parts.append((country, *series))
+                    print(f"[{done}/{len(items)}] {country} [ok] rows={len(series[0])}", flush=True)
+                else:
+                    print(f"[{done}/{len(items)}] {country} [warn] no data extracted", flush=True)
+
+                if done % 5 == 0:
+                    elapsed = int(time.time() - start)
+                    print(f"[progress] {done}/{len(items)} processed in {elapsed}s", flush=True)
+    finally:
+        _release_drivers([h.driver for h in holders if h.driver is not None])
 
-        new_panel = pd.concat(all_rows, ignore_index=True).sort_values(["country", "date"]).reset_index(drop=True)
-        write_outputs(new_panel)
+    return parts
 
-    finally:
-        driver.quit()
+
+def main():
+    items = [(c, COUNTRY_URL[c]) for c in TARGET_COUNTRIES]
+    print(f"[info] will_process={len(items)} countries", flush=True)
+
+    parts = []
+    to_fetch = []
+    for country, url in items:
+        cached = load_cached_series(country)
+        if cached is not None:
+            parts.append((country, *cached))
+            print(f"[cache] {country} [ok] rows={len(cached[0])}", flush=True)
+        else:
+            to_fetch.append((country, url))
+
+    results = {}
+    if to_fetch and not USE_SELENIUM:
+        results = asyncio.run(fetch_all_http(to_fetch))
+
+    missing = []
+    for country, url in to_fetch:
+        series = results.get(country)
+        if series is not None:
+            parts.append((country, *series))
+            save_cached_series(country, *series)
+            print(f"[http] {country} [ok] rows={len(series[0])}", flush=True)
+        else:
+            missing.append((country, url))
+
+    if missing:
+        print(f"[info] selenium fallback for {len(missing)} countries", flush=True)
+        for country, months, values in scrape_selenium_pool(missing):
+            parts.append((country, months, values))
+            save_cached_series(country, months, values)
+
+    if not parts:
+        raise RuntimeError("No data extracted for any target country.")
+
+    # Per-country results stay as (months, values) arrays; the only DataFrame
+    # is built here, one typed allocation per column. country is categorical —
+    # TARGET_COUNTRIES is alphabetical, so sort order matches the old strings,
+    # and Parquet/Arrow keep the dictionary encoding downstream.
+    new_panel = pd.DataFrame(
+        {
+            "country": pd.Categorical(
+                np.concatenate(
+                    [np.full(months.size, country, dtype=object) for country, months, _ in parts]
+                ),
+                categories=TARGET_COUNTRIES,
+            ),
+            "date": np.concatenate([months for _, months, _ in parts]),
+            "value": np.concatenate([values for _, _, values in parts]),
+        }
+    ).sort_values(["country", "date"], ignore_index=True)
+    write_outputs(new_panel)
 
 
 if __name__ == "__main__":